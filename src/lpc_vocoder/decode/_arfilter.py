@@ -0,0 +1,113 @@
+#  Copyright 2024 Hkxs
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the “Software”), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+import numba
+import numpy as np
+import numpy.typing as npt
+
+
+@numba.njit(cache=True, nogil=True)
+def ar_filter_inplace(a: npt.NDArray, gain: float, excitation: npt.NDArray, zi: npt.NDArray,
+                      out: npt.NDArray, de_emphasis: float = 0.0) -> None:
+    """
+    Apply the all-pole (AR) synthesis filter 1/A(z) to a scaled excitation.
+
+    This is equivalent to ``scipy.signal.lfilter([1.], a, gain * excitation, zi=zi)``
+    but it uses a transposed direct form II recursion compiled with numba, so
+    it can be called once per frame without the overhead of lfilter.
+
+    If ``de_emphasis`` is set, the de-emphasis filter ``1/(1 - de_emphasis*z^-1)``
+    is applied to the output within the same loop, which is the same as calling
+    lpc_vocoder.utils.utils.de_emphasis on the filtered frame.
+
+    Notes
+    -----
+    The filter state ``zi`` is updated in place, so it can be carried from one
+    frame to the next; the de-emphasis filter always starts from rest. The
+    coefficients are expected to be normalized (``a[0] == 1``), as the ones
+    generated by LpcEncoder.
+
+    The filter is kept in direct form instead of a cascade of second order
+    sections: the coefficients change on every frame, factoring them into
+    sections requires the roots of A(z) for each frame (slower than filtering
+    the whole signal), and the state of a cascade can't be carried between
+    frames with a different factorization.
+
+    Parameters
+    ----------
+    a : npt.NDArray
+        LPC coefficients of order+1 elements (first element is always '1').
+    gain : float
+        Gain applied to the excitation signal.
+    excitation : npt.NDArray
+        Excitation signal of the frame.
+    zi : npt.NDArray
+        Filter state of order elements, it will be updated in place.
+    out : npt.NDArray
+        Output buffer, it must have the same size as the excitation.
+    de_emphasis : float, optional
+        De-emphasis coefficient (default is 0, no de-emphasis).
+    """
+    order = a.shape[0] - 1
+    previous = 0.0
+    for n in range(excitation.shape[0]):
+        yn = gain * excitation[n]
+        if order > 0:  # a filter of order 0 has no state, numba doesn't check the bounds of zi
+            yn += zi[0]
+            for k in range(order - 1):
+                zi[k] = zi[k + 1] - a[k + 1] * yn
+            zi[order - 1] = -a[order] * yn
+        previous = yn + de_emphasis * previous
+        out[n] = previous
+
+
+@numba.njit(cache=True, nogil=True)
+def ar_filter_overlap_add(coefficients: npt.NDArray, gains: npt.NDArray, excitations: npt.NDArray,
+                          starts: npt.NDArray, zi: npt.NDArray, out: npt.NDArray, de_emphasis: float = 0.0) -> None:
+    """
+    Apply the AR synthesis filter to a batch of frames (one frame per row) and
+    overlap-add the result into the output signal.
+
+    The filter state ``zi`` is carried from one frame to the next (and updated
+    in place), which is the same as calling ar_filter_inplace for each frame.
+
+    Parameters
+    ----------
+    coefficients : npt.NDArray
+        Matrix with the LPC coefficients of each frame, shape (frames, order+1).
+    gains : npt.NDArray
+        Gain of each frame.
+    excitations : npt.NDArray
+        Matrix with the excitation of each frame, shape (frames, window size).
+    starts : npt.NDArray
+        Index of the output signal where each frame starts.
+    zi : npt.NDArray
+        Filter state of order elements, it will be updated in place.
+    out : npt.NDArray
+        Output signal, the frames are added to it.
+    de_emphasis : float, optional
+        De-emphasis coefficient applied to each frame (default is 0, no
+        de-emphasis).
+    """
+    window_size = excitations.shape[1]
+    frame = np.empty(window_size)
+    for i in range(excitations.shape[0]):
+        ar_filter_inplace(coefficients[i], gains[i], excitations[i], zi, frame, de_emphasis)
+        out[starts[i]:starts[i] + window_size] += frame
@@ -19,13 +19,16 @@
 #  SOFTWARE.
 
 import logging
+import os
 import struct
 from pathlib import Path
 
 import numpy as np
-import scipy
-from lpc_vocoder.utils.dataclasses import EncodedFrame
-from lpc_vocoder.utils.utils import de_emphasis
+import numpy.typing as npt
+from lpc_vocoder.decode._arfilter import ar_filter_overlap_add
+from lpc_vocoder.utils.dataclasses import FrameDataMixin
+from lpc_vocoder.utils.dataclasses import frame_dtype
+from lpc_vocoder.utils.utils import EMPHASIS_COEFFICIENT
 from lpc_vocoder.utils.utils import gen_excitation
 from lpc_vocoder.utils.utils import play_signal
 
@@ -33,7 +36,7 @@ from lpc_vocoder.utils.utils import play_signal
 logger = logging.getLogger(__name__)
 
 
-class LpcDecoder:
+class LpcDecoder(FrameDataMixin):
     """
     A class for decoding LPC-encoded audio back to a waveform.
 
@@ -56,20 +59,40 @@ class LpcDecoder:
         The order of the LPC filter.
     signal : npt.NDArray
         The reconstructed audio signal.
+    _gains : npt.NDArray
+        The gain of each frame.
+    _pitches : npt.NDArray
+        The pitch of each frame.
+    _coefficients : npt.NDArray
+        The LPC coefficients of each frame, one frame per row.
+    _filter_state : npt.NDArray
+        The state of the synthesis filter, allocated once the order is known.
+    _rng : np.random.Generator
+        Random generator used for the excitation of unvoiced frames.
     """
 
-    def __init__(self):
+    def __init__(self, seed: int | None = None) -> None:
         """
         Creates a Decoder instance that ca be used to reconstruct the signal
         encoded by LpcEncoder.
+
+        Parameters
+        ----------
+        seed : int, optional
+            Seed for the noise excitation of unvoiced frames, decoding the same
+            data with the same seed gives the same signal.
         """
-        self.data = []
-        self.sample_rate = None
-        self.window_size = None
-        self.overlap = None
-        self.order = None
-        self.frame_data = []
-        self.signal = None
+        self.data: list = []
+        self.sample_rate = 0
+        self.window_size = 0
+        self.overlap = 0
+        self.order = 0
+        self._gains = np.empty(0)
+        self._pitches = np.empty(0)
+        self._coefficients = np.empty((0, 0))
+        self._filter_state = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+        self.signal: npt.NDArray | None = None
 
     def load_data(self, data: dict) -> None:
         """
@@ -79,16 +102,31 @@ class LpcDecoder:
         -----
         This data should come from LpcEncoder().to_dict() method
 
+        The frames can be either a list of dictionaries (one per frame) or a
+        dictionary of columns, with the gain, pitch and coefficients of all
+        the frames: {"gain": [...], "pitch": [...], "coefficients": [[...], ...]}
+
         Parameters
         ----------
         data : dict
             Dictionary containing encoded frames and metadata.
         """
-        self.frame_data = [EncodedFrame(**frame) for frame in data["frames"]]
         self.window_size = data["encoder_info"]["window_size"]
         self.sample_rate = data["encoder_info"]["sample_rate"]
         self.overlap = data["encoder_info"]["overlap"]
         self.order = data["encoder_info"]["order"]
+        self._filter_state = np.zeros(self.order, dtype=np.float64)
+
+        frames = data["frames"]
+        if isinstance(frames, dict):
+            gains, pitches, coefficients = frames["gain"], frames["pitch"], frames["coefficients"]
+        else:
+            gains = [frame["gain"] for frame in frames]
+            pitches = [frame["pitch"] for frame in frames]
+            coefficients = [frame["coefficients"] for frame in frames]
+        self._gains = np.asarray(gains, dtype=np.float64)
+        self._pitches = np.asarray(pitches, dtype=np.float64)
+        self._coefficients = np.asarray(coefficients, dtype=np.float64).reshape(len(self._gains), self.order + 1)
 
     def load_data_file(self, filename: Path) -> None:
         """
@@ -107,36 +145,39 @@ class LpcDecoder:
         ----------
         filename : Path
             The path to the binary file to load.
+
+        Raises
+        ------
+        ValueError
+            If the header has an order lower than 1, or the size of the file
+            doesn't match the format written by LpcEncoder().save_data(), e.g.
+            files with float64 coefficients.
         """
+        header = struct.Struct("4i")
         with open(filename, "rb") as f:
-            encoded_data = f.read()
-
-        offset = 0
-        self.window_size = struct.unpack_from("i", encoded_data, offset)[0]
-        offset += struct.calcsize("i")
-        self.sample_rate = struct.unpack_from("i", encoded_data, offset)[0]
-        offset += struct.calcsize("i")
-        self.overlap = struct.unpack_from("i", encoded_data, offset)[0]
-        offset += struct.calcsize("i")
-        self.order = struct.unpack_from("i", encoded_data, offset)[0]
-        offset += struct.calcsize("i")
+            header_data = f.read(header.size)
+            if len(header_data) != header.size:
+                raise ValueError(f"'{filename}' is too short to be an encoded file")
+            window_size, sample_rate, overlap, order = header.unpack(header_data)
+            if order < 1:
+                raise ValueError(f"'{filename}' is not a valid encoded file, invalid LPC order {order}")
+            dtype = frame_dtype(order)
+            frames_size = os.fstat(f.fileno()).st_size - header.size
+            if frames_size % dtype.itemsize:
+                raise ValueError(f"'{filename}' is not a valid encoded file, {frames_size} bytes of frame data "
+                                 f"aren't a multiple of the frame size ({dtype.itemsize} bytes for order {order})")
+            frames = np.fromfile(f, dtype=dtype)
+        self.window_size, self.sample_rate, self.overlap, self.order = window_size, sample_rate, overlap, order
+        self._filter_state = np.zeros(self.order, dtype=np.float64)
 
         logger.debug(f"Encoding order: {self.order}")
         logger.debug(f"Sample rate: {self.sample_rate}")
         logger.debug(f"Using window size: {self.window_size}")
 
-        while offset < len(encoded_data):
-            gain = struct.unpack_from('d', encoded_data, offset)[0]
-            offset += struct.calcsize('d')
-
-            pitch = struct.unpack_from('d', encoded_data, offset)[0]
-            offset += struct.calcsize('d')
-
-            coefficients = np.frombuffer(encoded_data, dtype=np.float64, count=self.order + 1, offset=offset)
-            offset += (self.order + 1) * coefficients.itemsize
-
-            frame_data = EncodedFrame(float(gain), float(pitch), coefficients)
-            self.frame_data.append(frame_data)
+        # promote the fields once to contiguous float64 arrays, this is the type used by the synthesis kernel
+        self._gains = np.ascontiguousarray(frames["gain"], dtype=np.float64)
+        self._pitches = np.ascontiguousarray(frames["pitch"], dtype=np.float64)
+        self._coefficients = np.ascontiguousarray(frames["coefficients"], dtype=np.float64)
 
     def decode_signal(self) -> None:
         """
@@ -144,25 +185,51 @@ class LpcDecoder:
 
         This method applies filtering and overlap-add synthesis to reconstruct the original signal
         from encoded frame data, gain, pitch, and coefficients.
+
+        Notes
+        -----
+        The state of the synthesis filter is carried from one frame to the next one, so frames are
+        filtered sequentially. The work that doesn't depend on that state (de-emphasis) is done in the
+        same compiled loop, splitting it across processes would cost more in data transfer than it saves.
+
+        Raises
+        ------
+        ValueError
+            If the order is lower than 1 or the frames don't have order+1
+            coefficients.
         """
-        initial_conditions = np.zeros(self.order)
+        if self.order < 1:
+            raise ValueError(f"Invalid LPC order {self.order}, it must be at least 1")
+        if len(self._gains) and self._coefficients.shape[1] != self.order + 1:
+            raise ValueError(f"Frames have {self._coefficients.shape[1]} coefficients, "
+                             f"{self.order + 1} expected for order {self.order}")
+        if self._filter_state.shape != (self.order,):  # frame_data and order can be set without loading the data
+            self._filter_state = np.zeros(self.order, dtype=np.float64)
+        self._filter_state.fill(0.0)  # decoding always starts from rest
         hop_size = int(self.window_size * (1 - self.overlap/100))  # calculate overlap in samples
-        total_length = len(self.frame_data) * hop_size + self.window_size
-        output_signal = np.zeros(total_length)
+        total_length = len(self._gains) * hop_size + self.window_size
+        output_signal = np.zeros(total_length, dtype=np.float64)
 
         logger.debug(f"Using Overlap: {self.overlap}% ({hop_size} samples)")
-        for index, frame in enumerate(self.frame_data):
-            if not frame.gain:
-                logger.debug("Adding Silence")
-                reconstructed = np.zeros(self.window_size)  # just add silence
-            else:
-                excitation = gen_excitation(frame.pitch, self.window_size, self.sample_rate)
-                reconstructed, initial_conditions = scipy.signal.lfilter([1.], frame.coefficients,
-                                                                         frame.gain * excitation, zi=initial_conditions)
-                reconstructed = de_emphasis(reconstructed)
-            start_idx = index * hop_size
-            end_idx = start_idx + self.window_size
-            output_signal[start_idx:end_idx] += reconstructed
+        active = np.flatnonzero(self._gains)  # non silent frames, silence doesn't add anything to the output
+        logger.debug(f"Skipping {len(self._gains) - len(active)} silence frames")
+        if not active.size:
+            self.signal = output_signal
+            return
+
+        pitches = self._pitches[active]
+        unvoiced = pitches == -1
+        logger.debug(f"Using noise as excitation for {np.count_nonzero(unvoiced)} frames, "
+                     f"impulse train for {np.count_nonzero(~unvoiced)} frames")
+        excitations = np.empty((len(active), self.window_size), dtype=np.float64)
+        # noise for all the unvoiced frames is generated at once, same as gen_excitation does for a single frame
+        excitations[unvoiced] = self._rng.standard_normal((np.count_nonzero(unvoiced), self.window_size))
+        for row in np.flatnonzero(~unvoiced):
+            excitations[row] = gen_excitation(pitches[row], self.window_size, self.sample_rate, self._rng)
+
+        # the filter state is carried from one frame to the next one, de-emphasis is applied by the same kernel
+        ar_filter_overlap_add(self._coefficients[active], self._gains[active], excitations, active * hop_size,
+                              self._filter_state, output_signal, EMPHASIS_COEFFICIENT)
         self.signal = output_signal
 
     def save_audio(self, filename: Path) -> None:
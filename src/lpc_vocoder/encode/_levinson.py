@@ -0,0 +1,97 @@
+#  Copyright 2024 Hkxs
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the “Software”), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+import numba
+import numpy as np
+import numpy.typing as npt
+
+
+@numba.njit(cache=True, nogil=True)
+def levinson(rxx: npt.NDArray, a: npt.NDArray) -> None:
+    """
+    Solve the normal equations of the autocorrelation method using the
+    Levinson-Durbin recursion.
+
+    This gives the same result as ``scipy.linalg.solve_toeplitz`` on the
+    autocorrelation matrix, but without the overhead of scipy on small (order
+    10-40) systems. The coefficients are written to ``a``, so the encoder can
+    fill a preallocated matrix one row at a time.
+
+    Parameters
+    ----------
+    rxx : npt.NDArray
+        Autocorrelation of the frame, at least order+1 lags.
+    a : npt.NDArray
+        Output buffer of order+1 elements, it'll have the LPC coefficients
+        (first element is always '1'). A frame without energy (or one that is
+        predicted perfectly) leaves the remaining coefficients at zero.
+
+    Notes
+    -----
+    The recursion is not unrolled for a fixed order: a kernel generated at
+    runtime can't use the numba disk cache, so it's compiled on every run,
+    and that takes longer than solving all the frames of a long file.
+    """
+    order = a.shape[0] - 1
+    a[:] = 0.0
+    a[0] = 1.0
+    error = rxx[0]
+    for i in range(order):
+        if error <= 0.0:  # nothing left to predict, avoid dividing by zero
+            break
+        acc = rxx[i + 1]
+        for j in range(1, i + 1):
+            acc += a[j] * rxx[i + 1 - j]
+        k = -acc / error
+        # a[1:i+2] += k * a[i+1::-1], updating both ends of the vector at once
+        for j in range(1, (i + 1) // 2 + 1):
+            low = a[j]
+            high = a[i + 1 - j]
+            a[j] = low + k * high
+            if j != i + 1 - j:
+                a[i + 1 - j] = high + k * low
+        a[i + 1] = k
+        error *= 1.0 - k * k
+
+
+@numba.njit(cache=True, nogil=True, parallel=True)
+def levinson_frames(autocorrelation: npt.NDArray, coefficients: npt.NDArray, gains: npt.NDArray) -> None:
+    """
+    Calculate the LPC coefficients and the gain of a batch of frames (one frame
+    per row), the frames are independent so they're distributed between
+    threads.
+
+    The gain is the square root of the prediction error of each frame.
+
+    Parameters
+    ----------
+    autocorrelation : npt.NDArray
+        Matrix with the autocorrelation of each frame, shape (frames, order+1).
+    coefficients : npt.NDArray
+        Output matrix for the LPC coefficients, shape (frames, order+1).
+    gains : npt.NDArray
+        Output array for the gain of each frame.
+    """
+    for i in numba.prange(autocorrelation.shape[0]):
+        levinson(autocorrelation[i], coefficients[i])
+        error = 0.0
+        for k in range(coefficients.shape[1]):
+            error += coefficients[i, k] * autocorrelation[i, k]
+        gains[i] = np.sqrt(max(error, 0.0))  # clamp rounding errors of an almost perfect predictor
@@ -20,25 +20,26 @@
 
 
 import logging
-import struct
 from pathlib import Path
-from typing import Generator
 
 import librosa
-import librosa.feature
 import numpy as np
 import numpy.typing as npt
-import scipy
-from lpc_vocoder.utils.dataclasses import EncodedFrame
-from lpc_vocoder.utils.pitch_estimation import pitch_estimator
-from lpc_vocoder.utils.utils import get_frame_gain
+import soundfile as sf
+from lpc_vocoder.encode._levinson import levinson_frames
+from lpc_vocoder.utils.dataclasses import FrameDataMixin
+from lpc_vocoder.utils.dataclasses import frame_dtype
+from lpc_vocoder.utils.pitch_estimation import pitch_from_autocorrelation
+from lpc_vocoder.utils.pitch_estimation import pitch_lags
+from lpc_vocoder.utils.utils import autocorrelate
 from lpc_vocoder.utils.utils import is_silence
 from lpc_vocoder.utils.utils import pre_emphasis
+from numpy.lib.stride_tricks import sliding_window_view
 
 logger = logging.getLogger(__name__)
 
 
-class LpcEncoder:
+class LpcEncoder(FrameDataMixin):
     """
     A class for encoding a speech signal using linear predictive coding (LPC).
 
@@ -54,8 +55,11 @@ class LpcEncoder:
 
     Attributes
     ----------
-    _frames : npt.NDArray or Generator
-        An array or generator of audio frames.
+    _frames : npt.NDArray
+        A 2-D array of audio frames, one frame per row.
+    _incomplete_frames : int
+        The number of frames at the end of the signal that are shorter than
+        the window, they're encoded as silence.
     sample_rate : int
         The sample rate of the audio signal.
     order : int
@@ -68,7 +72,16 @@ class LpcEncoder:
         The percentage overlap between adjacent windows.
     _hop_size : int
         The number of samples between adjacent windows.
+    _window : npt.NDArray
+        Hamming window applied to each frame before the LPC analysis.
+    _gains : npt.NDArray
+        The gain of each frame.
+    _pitches : npt.NDArray
+        The pitch of each frame.
+    _coefficients : npt.NDArray
+        The LPC coefficients of each frame (float32), one frame per row.
     """
+    _coefficients_dtype = np.float32
 
     def __init__(self, order: int = 10):
         """
@@ -80,10 +93,14 @@ class LpcEncoder:
             LPC predictor order, default=10
         """
         logger.debug(f"Encoding order: {order}")
-        self._frames: npt.NDArray | Generator[np.ndarray, None, None] = np.array([0])
+        self._frames: npt.NDArray = np.empty((0, 0))
+        self._incomplete_frames = 0
+        self._window = np.empty(0)
         self.sample_rate = 0
         self.order = order
-        self.frame_data: list[EncodedFrame] = []
+        self._gains = np.empty(0)
+        self._pitches = np.empty(0)
+        self._coefficients = np.empty((0, 0), dtype=np.float32)
         self.window_size = 0
         self.overlap = 0
 
@@ -91,6 +108,11 @@ class LpcEncoder:
         """
         Convert the encoder information and frames to a dictionary.
 
+        The frames are given as columns (the gain, pitch and coefficients of
+        all the frames), which is one of the formats accepted by
+        LpcDecoder.load_data, so there is no need to build an object per frame.
+        The columns are copies, they don't share memory with the encoder.
+
         Returns
         -------
         dict
@@ -103,7 +125,11 @@ class LpcEncoder:
                 "overlap": self.overlap,
                 "sample_rate": self.sample_rate,
             },
-            "frames": [frame.__dict__ for frame in self.frame_data],
+            "frames": {
+                "gain": self._gains.copy(),
+                "pitch": self._pitches.copy(),
+                "coefficients": self._coefficients.copy(),
+            },
         }
         return signal_data
 
@@ -114,7 +140,8 @@ class LpcEncoder:
         Parameters
         ----------
         data : npt.NDArray
-            The audio signal to encode.
+            The audio signal to encode, float64 signals are not copied (the
+            frames are a view of them).
         sample_rate : int
             The sample rate of the audio.
         window_size : int
@@ -123,8 +150,8 @@ class LpcEncoder:
             The percentage overlap between adjacent frames (default is 50).
         """
         self._get_window_data(window_size, overlap)
-        self._frames = librosa.util.frame(data.astype(np.float64), frame_length=self.window_size,
-                                          hop_length=self._hop_size, axis=0)
+        self._frames = sliding_window_view(np.asarray(data, dtype=np.float64), self.window_size)[::self._hop_size]
+        self._incomplete_frames = 0
         self.sample_rate = sample_rate
         self.frame_data = []
 
@@ -141,16 +168,23 @@ class LpcEncoder:
         overlap : int, optional
             The percentage overlap between adjacent frames (default is 50).
         """
-        self.sample_rate = int(librosa.get_samplerate(str(filename)))
+        signal, self.sample_rate = sf.read(str(filename), dtype="float64", always_2d=False)
         logger.debug(f"Sample rate {self.sample_rate}")
         self._get_window_data(window_size, overlap)
-        self._frames = librosa.stream(str(filename), block_length=1, frame_length=self.window_size,
-                                      hop_length=self._hop_size, mono=False, dtype=np.float64)
+
+        # frames are a view of the signal, there is a frame for every hop that starts within the signal (as the
+        # blocks of librosa.stream), the ones shorter than the window are encoded as silence
+        if len(signal) < self.window_size:
+            self._frames = np.empty((0, self.window_size))
+        else:
+            self._frames = sliding_window_view(signal, self.window_size)[::self._hop_size]
+        self._incomplete_frames = -(-len(signal) // self._hop_size) - len(self._frames)
         self.frame_data = []
 
     def _get_window_data(self, window_size, overlap):
         """
-        Calculate and set window size and overlap.
+        Calculate and set window size and overlap, the analysis window is
+        created here so it's shared by all the frames.
 
         Parameters
         ----------
@@ -164,15 +198,36 @@ class LpcEncoder:
         logger.debug(f"Using window size: {self.window_size}")
         self._hop_size = self.window_size - int(overlap / 100 * self.window_size)  # calculate overlap in samples
         logger.debug(f"Using Overlap: {self.overlap}% ({self._hop_size} samples)")
+        self._window = librosa.filters.get_window('hamming', self.window_size).astype(np.float64)
 
     def encode_signal(self) -> None:
         """
         Encode the loaded audio signal into LPC frames.
         """
         logger.debug("Encoding Signal")
-        for frame in self._frames:
-            frame_data = self._process_frame(frame)
-            self.frame_data.append(frame_data)
+        n_frames = len(self._frames) + self._incomplete_frames
+        active = np.flatnonzero(~is_silence(self._frames))
+        logger.debug(f"Silence found in {n_frames - len(active)} frames")
+
+        # window and emphasize all the active (non silent) frames at once, pre_emphasis works over the last axis
+        emphasized = pre_emphasis(self._frames[active] * self._window)
+        autocorrelation = autocorrelate(emphasized, max_size=self.order + 1)
+
+        # silence frames keep a gain and pitch of 0 and the coefficients from np.ones, the coefficients are
+        # solved in float64 but stored as float32
+        self._gains = np.zeros(n_frames, dtype=np.float64)
+        self._pitches = np.zeros(n_frames, dtype=np.float64)
+        self._coefficients = np.ones((n_frames, self.order + 1), dtype=np.float32)
+        coefficients = np.empty((len(active), self.order + 1), dtype=np.float64)
+        gains = np.empty(len(active), dtype=np.float64)
+        levinson_frames(autocorrelation, coefficients, gains)
+        self._coefficients[active] = coefficients
+        self._gains[active] = gains
+
+        # the pitch uses the autocorrelation of the raw frames (up to the longest pitch period), it's calculated
+        # with one FFT as well
+        pitch_autocorrelation = autocorrelate(self._frames[active], max_size=pitch_lags(self.sample_rate))
+        self._pitches[active] = pitch_from_autocorrelation(pitch_autocorrelation, self.sample_rate)
 
     def save_data(self, filename: Path) -> None:
         """
@@ -187,9 +242,10 @@ class LpcEncoder:
         header = frame size (int), sample rate (int), overlap (int), order (int)
 
         Each frame contains the following information:
-        frame = pitch (float), gain (float), coefficients
+        frame = gain (float), pitch (float), coefficients
 
-        The coefficients are a np.array of order+1 elements (floats)
+        The coefficients are a np.array of order+1 elements (float32), all the
+        frames are written at once as a numpy structured array.
 
         Parameters
         ----------
@@ -199,62 +255,12 @@ class LpcEncoder:
         if not filename.suffix:
             filename = filename.with_suffix(".bin")
         logger.debug(f"Saving data to '{filename}'")
-        data = bytearray()
-        data.extend(struct.pack('i', self.window_size))
-        data.extend(struct.pack('i', self.sample_rate))
-        data.extend(struct.pack('i', self.overlap))
-        data.extend(struct.pack('i', self.order))
-
-        for frame in self.frame_data:
-            data.extend(struct.pack('d', frame.gain))
-            data.extend(struct.pack('d', frame.pitch))
-            data.extend(frame.coefficients.tobytes())
+        header = np.array([self.window_size, self.sample_rate, self.overlap, self.order], dtype=np.int32)
+        frames = np.empty(len(self._gains), dtype=frame_dtype(self.order))
+        frames["gain"] = self._gains
+        frames["pitch"] = self._pitches
+        frames["coefficients"] = self._coefficients
 
         with open(filename, "wb") as f:
-            f.write(data)
-
-    def _process_frame(self, frame: npt.NDArray) -> EncodedFrame:
-        """
-        Process a single frame to calculate LPC coefficients, gain, and pitch.
-
-        Parameters
-        ----------
-        frame : npt.NDArray
-            The audio frame to process.
-
-        Returns
-        -------
-        EncodedFrame
-            An EncodedFrame object with the processed data.
-        """
-        if is_silence(frame) or len(frame) < self.window_size:
-            logger.debug("Silence found")
-            lpc_coefficients = np.ones(self.order + 1)
-            gain = 0.0
-            pitch = 0.0
-        else:
-            window = librosa.filters.get_window('hamming', self.window_size)
-            pitch = pitch_estimator(frame, self.sample_rate)
-            frame = pre_emphasis(window * frame)
-            lpc_coefficients = self._calculate_lpc(frame)
-            gain = get_frame_gain(frame, lpc_coefficients)
-
-        return EncodedFrame(gain, pitch, lpc_coefficients)
-
-    def _calculate_lpc(self, data: npt.NDArray) -> npt.NDArray:
-        """
-        Process a signal and calculate it's LPC coefficients
-
-        Parameters
-        ----------
-        data : npt.NDArray
-            The audio frame to process.
-
-        Returns
-        -------
-        npt.NDArray
-            LPC coefficients of order+1 (first element is always '1')
-        """
-        rxx = librosa.autocorrelate(data, max_size=self.order + 1)
-        coefficients = scipy.linalg.solve_toeplitz((rxx[:-1], rxx[:-1]), rxx[1:])
-        return np.concatenate(([1], -coefficients))
+            header.tofile(f)
+            frames.tofile(f)
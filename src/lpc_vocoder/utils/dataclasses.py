@@ -20,6 +20,7 @@
 
 from dataclasses import dataclass
 
+import numpy as np
 import numpy.typing as npt
 
 
@@ -44,3 +45,63 @@ class EncodedFrame:
 
     def __str__(self):
         return f"{self.pitch}, {self.gain}, {self.coefficients}"
+
+
+def frame_dtype(order: int) -> np.dtype:
+    """
+    Structured type of the frames in the binary files written by
+    LpcEncoder.save_data and read by LpcDecoder.load_data_file.
+
+    Parameters
+    ----------
+    order : int
+        Order of the LPC filter, each frame has order+1 coefficients.
+
+    Returns
+    -------
+    np.dtype
+        Type of a frame: gain (float64), pitch (float64) and coefficients
+        (float32).
+    """
+    return np.dtype([("gain", "f8"), ("pitch", "f8"), ("coefficients", "f4", (order + 1,))])
+
+
+class FrameDataMixin:
+    """
+    Shared frame_data access for LpcEncoder and LpcDecoder.
+
+    The frames are stored as arrays: the gain and pitch of each frame, and a
+    matrix with the LPC coefficients of each frame (one frame per row).
+
+    Attributes
+    ----------
+    _coefficients_dtype : type
+        Type used to store the LPC coefficients.
+    """
+    _coefficients_dtype: type = np.float64
+    _gains: npt.NDArray
+    _pitches: npt.NDArray
+    _coefficients: npt.NDArray
+
+    @property
+    def frame_data(self) -> list[EncodedFrame]:
+        """
+        Encoded frames, the list is generated from the frame arrays on every
+        access.
+
+        Notes
+        -----
+        The list is a copy, coefficients included (all the rows are copied at
+        once): appending frames to it or changing the gain, pitch or
+        coefficients of a frame has no effect, assign a new list to frame_data
+        instead.
+        """
+        return [EncodedFrame(float(gain), float(pitch), coefficients)
+                for gain, pitch, coefficients in zip(self._gains, self._pitches, self._coefficients.copy())]
+
+    @frame_data.setter
+    def frame_data(self, frames: list[EncodedFrame]) -> None:
+        self._gains = np.array([frame.gain for frame in frames], dtype=np.float64)
+        self._pitches = np.array([frame.pitch for frame in frames], dtype=np.float64)
+        self._coefficients = (np.stack([frame.coefficients for frame in frames], dtype=self._coefficients_dtype)
+                              if frames else np.empty((0, 0), dtype=self._coefficients_dtype))
@@ -22,22 +22,44 @@ import logging
 
 import numpy as np
 import numpy.typing as npt
+from lpc_vocoder.utils.utils import autocorrelate
 
 logger = logging.getLogger(__name__)
 
+# pitch search bands in Hz, the low band is only used if nothing is found in the speech band
+SPEECH_BANDWIDTH = (100, 600)
+LOW_BANDWIDTH = (40, 100)
 
-def _period_estimator(rxx: npt.NDArray, sample_rate: float, bandwidth: tuple[float, float], umbral: float) -> float:
+
+def _period_estimator(rxx: npt.NDArray, sample_rate: float, bandwidth: tuple[float, float],
+                      umbral: float) -> npt.NDArray:
     min_sample = int(sample_rate // bandwidth[1])
     max_sample = int(sample_rate // bandwidth[0])
 
-    logger.debug(f"{min_sample=}, {max_sample=}")
-    amplitude = rxx[min_sample:max_sample].max()
-    logger.debug(f"Max Energy: {float(rxx[0])}, Harmonic Energy: {float(amplitude)}, Ratio: {float(amplitude/rxx[0])}")
+    logger.debug("min_sample=%d, max_sample=%d", min_sample, max_sample)
+    harmonic = rxx[..., min_sample:max_sample].argmax(axis=-1) + min_sample
+    amplitude = np.take_along_axis(rxx, harmonic[..., np.newaxis], axis=-1)[..., 0]
+
+    # the voiced/unvoiced decision is a mask, so all the frames of a batch are checked at once
+    return harmonic * (amplitude >= umbral * rxx[..., 0])
 
-    index = rxx[min_sample:max_sample].argmax(axis=0)
-    period = (index + min_sample) if amplitude >= (umbral * rxx[0]) else 0
-    logger.debug(f"Harmonic Index: {int(period)}")
-    return period
+
+def pitch_lags(sample_rate: float) -> int:
+    """
+    Number of autocorrelation lags needed to estimate the pitch, the longest
+    period searched is the one of the lowest pitch (LOW_BANDWIDTH).
+
+    Parameters
+    ----------
+    sample_rate : int
+        Sample rate of the signal
+
+    Returns
+    -------
+    int
+        Number of lags, starting at lag 0.
+    """
+    return int(sample_rate // LOW_BANDWIDTH[0])
 
 
 def pitch_estimator(signal: npt.NDArray, sample_rate: float) -> float:
@@ -68,26 +90,43 @@ def pitch_estimator(signal: npt.NDArray, sample_rate: float) -> float:
     -------
     pitch : float
     """
-    umbral = 0.30
-    speech_bandwidth = (100, 600)
-    max_period = (sample_rate // speech_bandwidth[1])
-
-    rxx = np.correlate(signal, signal, mode='full')[len(signal) - 1:]
-
-    period = _period_estimator(rxx, sample_rate, speech_bandwidth, umbral)
-    if period <= max_period:
-        # Our signal is so low on frequency that we need to update our interval,
-        # we'll adjust the bandwidth and the umbral
-        umbral = 0.1
-        max_period = (sample_rate // speech_bandwidth[1])
-        speech_bandwidth = (40, 100)
-        period = _period_estimator(rxx, sample_rate, speech_bandwidth, umbral)
-        if period < max_period:
-            # if after the bandwidth adjustment we're still over the limit,
-            # mark it as non-periodic
-            period = 0
-            logger.debug("Non-periodic signal")
-
-    freq = sample_rate / period if period else -1
-    logger.debug(f"Pitch: {freq}")
-    return freq
+    rxx = autocorrelate(signal, max_size=pitch_lags(sample_rate))
+    return pitch_from_autocorrelation(rxx, sample_rate)
+
+
+def pitch_from_autocorrelation(rxx: npt.NDArray, sample_rate: float) -> npt.NDArray | float:
+    """
+    Estimate the pitch of a signal from its autocorrelation, this is the same
+    as pitch_estimator but it allows to calculate the autocorrelation of a
+    batch of frames at once (see lpc_vocoder.utils.utils.autocorrelate).
+
+    If ``rxx`` is a matrix, each row is the autocorrelation of a frame and the
+    pitch of all the frames is estimated at once.
+
+    Parameters
+    ----------
+    rxx : npt.NDArray
+        Autocorrelation of the signal, from lag 0, only the first
+        pitch_lags(sample_rate) lags are used.
+    sample_rate : int
+        Sample rate of the signal
+
+    Returns
+    -------
+    pitch : npt.NDArray | float
+        The pitch of the signal, or of each frame for matrices.
+    """
+    max_period = (sample_rate // SPEECH_BANDWIDTH[1])
+
+    period = _period_estimator(rxx, sample_rate, SPEECH_BANDWIDTH, umbral=0.30)
+    # if our signal is so low on frequency we need to update our interval, we'll
+    # adjust the bandwidth and the umbral
+    low_period = _period_estimator(rxx, sample_rate, LOW_BANDWIDTH, umbral=0.1)
+    # if after the bandwidth adjustment we're still over the limit, mark it as
+    # non-periodic
+    low_period = np.where(low_period < max_period, 0, low_period)
+    period = np.where(period <= max_period, low_period, period)
+    logger.debug("Non-periodic frames: %d", np.count_nonzero(period == 0))
+
+    freq = np.divide(sample_rate, period, out=np.full(period.shape, -1.0), where=period != 0)
+    return freq if freq.ndim else float(freq)
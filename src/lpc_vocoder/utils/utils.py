@@ -19,20 +19,32 @@
 #  SOFTWARE.
 
 import logging
+from functools import lru_cache
 
-import librosa
-import librosa.feature
 import numpy as np
 import numpy.typing as npt
 import scipy
 
 logger = logging.getLogger(__name__)
 
+EMPHASIS_COEFFICIENT = 0.9375
+# filter coefficients are created once, so lfilter doesn't convert lists to arrays on every call
+_ONE = np.ones(1, dtype=np.float64)
+_EMPHASIS_FILTER = np.array([1, -EMPHASIS_COEFFICIENT], dtype=np.float64)
+# -60 dB of the RMS, as a power ratio, and the minimum amplitude used by librosa.amplitude_to_db
+_SILENCE_THRESHOLD = 1e-6
+_AMIN = 1e-5
+# default generator for the noise excitation, it's created once and shared by the calls to gen_excitation without rng
+_RNG = np.random.default_rng()
+
 
 def pre_emphasis(signal: npt.NDArray) -> npt.NDArray:
     """
     Apply a pre-emphasis filter to the input signal to amplify high frequencies.
 
+    The filter is ``y[n] = x[n] - EMPHASIS_COEFFICIENT * x[n-1]``, it's applied
+    over the last axis, so a matrix of frames is filtered row by row.
+
     Parameters
     ----------
     signal : npt.NDArray
@@ -43,7 +55,10 @@ def pre_emphasis(signal: npt.NDArray) -> npt.NDArray:
     npt.NDArray
         The pre-emphasized signal.
     """
-    return scipy.signal.lfilter([1, -0.9375], [1], signal)
+    emphasized = np.empty_like(signal, dtype=np.float64)
+    emphasized[..., 0] = signal[..., 0]
+    np.subtract(signal[..., 1:], EMPHASIS_COEFFICIENT * signal[..., :-1], out=emphasized[..., 1:])
+    return emphasized
 
 
 def de_emphasis(signal: npt.NDArray) -> npt.NDArray:
@@ -61,14 +76,43 @@ def de_emphasis(signal: npt.NDArray) -> npt.NDArray:
     npt.NDArray
         The de-emphasized (original) signal.
     """
-    return scipy.signal.lfilter([1], [1, -0.9375], signal)
+    return scipy.signal.lfilter(_ONE, _EMPHASIS_FILTER, signal)
+
 
+@lru_cache(maxsize=512)
+def _impulse_train(period: int, frame_size: int) -> npt.NDArray:
+    """
+    Generate an impulse train, the result is cached since voiced frames usually
+    share the same pitch.
 
-def gen_excitation(pitch: float, frame_size: int, sample_rate: int):
+    Parameters
+    ----------
+    period : int
+        Number of samples between impulses.
+    frame_size : int
+        The number of samples in the generated signal.
+
+    Returns
+    -------
+    npt.NDArray
+        Read-only impulse train.
+    """
+    excitation = np.zeros(frame_size, dtype=np.float64)
+    excitation[::period] = 1.0
+    excitation.flags.writeable = False
+    return excitation
+
+
+def gen_excitation(pitch: float, frame_size: int, sample_rate: int, rng: np.random.Generator | None = None):
     """
     Generate an excitation signal for use in speech synthesis, either as noise
     or an impulse train.
 
+    Notes
+    -----
+    Impulse trains are cached and shared between calls, so they are returned
+    as read-only arrays.
+
     Parameters
     ----------
     pitch : float
@@ -78,6 +122,9 @@ def gen_excitation(pitch: float, frame_size: int, sample_rate: int):
         The number of samples in the generated excitation signal.
     sample_rate : int
         The sampling rate of the signal.
+    rng : np.random.Generator, optional
+        Random generator used for the noise excitation, the module generator
+        (created once, unseeded) is used if it's not given.
 
     Returns
     -------
@@ -85,58 +132,68 @@ def gen_excitation(pitch: float, frame_size: int, sample_rate: int):
         The generated excitation signal.
     """
     if pitch == -1:
-        logger.debug("Using noise as excitation")
-        excitation = np.random.uniform(0, 1, frame_size)
+        excitation = (_RNG if rng is None else rng).standard_normal(frame_size)
     else:
-        logger.debug("Using impulse train as excitation")
         period = int(sample_rate // int(pitch))
-        excitation = scipy.signal.unit_impulse(frame_size, range(0, frame_size, period))
+        excitation = _impulse_train(period, frame_size)
     return excitation
 
 
-def get_frame_gain(frame: npt.NDArray, coefficients: npt.NDArray) -> float:
+def autocorrelate(frames: npt.NDArray, max_size: int) -> npt.NDArray:
     """
-    Calculate the gain of a frame based on autocorrelation and filter
-    coefficients.
+    Calculate the autocorrelation of a batch of frames (one frame per row).
+
+    All the frames are transformed with a single call to rfft/irfft, so the
+    FFT is planned once instead of once per frame like librosa.autocorrelate.
+    The FFT is only long enough to keep the first ``max_size`` lags free of
+    circular aliasing, so asking for fewer lags makes it shorter.
 
     Parameters
     ----------
-    frame : npt.NDArray
-        The audio frame for which gain is calculated.
-    coefficients : npt.NDArray
-        LPC filter coefficients.
+    frames : npt.NDArray
+        Matrix of frames, shape (frames, frame size).
+    max_size : int
+        Number of lags to return, at most the frame size.
 
     Returns
     -------
-    float
-        The calculated gain for the frame.
+    npt.NDArray
+        Autocorrelation of each frame, shape (frames, max_size).
     """
-    rxx = librosa.autocorrelate(frame, max_size=len(coefficients))
-    gain = np.sqrt(np.dot(coefficients, rxx))
-    logger.debug(f"Gain {gain}")
-    return gain
+    max_size = min(max_size, frames.shape[-1])
+    n_fft = scipy.fft.next_fast_len(frames.shape[-1] + max_size - 1, real=True)
+    spectrum = scipy.fft.rfft(frames, n=n_fft, axis=-1, workers=-1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return scipy.fft.irfft(power, n=n_fft, axis=-1, workers=-1)[..., :max_size]
 
 
-def is_silence(signal: npt.NDArray) -> bool:
+def is_silence(signal: npt.NDArray) -> npt.NDArray:
     """
     Check if the input signal is silent, using -60 dB as the threshold. This is
     based on librosa.effects._signal_to_frame_nonsilent
 
+    The RMS of blocks of 256 samples (centered, like librosa.feature.rms) is
+    compared against the loudest block, without converting it to dB. If
+    ``signal`` is a matrix, each row is checked independently.
+
     Parameters
     ----------
     signal : npt.NDArray
-        The input audio signal array.
+        The input audio signal array, or a matrix with one frame per row.
 
     Returns
     -------
-    bool
-        True if the signal is considered silent, False otherwise.
+    npt.NDArray
+        True if the signal is considered silent, False otherwise (one value
+        per row for matrices).
     """
-    rms = librosa.feature.rms(y=signal, frame_length=256, hop_length=256)
-    power = librosa.core.amplitude_to_db(rms[..., 0, :], ref=np.max, top_db=None)
-    logger.debug(f"Frame Energy '{power[0]}'")
-    silence = np.flatnonzero(power < -60)
-    return silence.size > 0
+    frame_length = 256
+    blocks = 1 + signal.shape[-1] // frame_length
+    padding = [(0, 0)] * (signal.ndim - 1) + [(frame_length // 2, frame_length // 2)]
+    padded = np.pad(signal, padding)[..., :blocks * frame_length]  # samples of the last incomplete block are dropped
+    power = np.mean(np.square(padded.reshape(*signal.shape[:-1], blocks, frame_length)), axis=-1)
+    power = np.maximum(power, _AMIN ** 2)
+    return np.any(power < _SILENCE_THRESHOLD * power.max(axis=-1, keepdims=True), axis=-1)
 
 
 def play_signal(signal: npt.NDArray, sample_rate: int):
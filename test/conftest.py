@@ -18,13 +18,21 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #  SOFTWARE.
 
+import numpy as np
 import pytest
+import soundfile as sf
+
+SINE_WAVE_SAMPLE_RATE = 8000
 
 
 def pytest_addoption(parser):
     parser.addoption("--subjective", action="store_true", default=False, help="Run subjective tests")
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "subjective: tests that play or plot the decoded audio, they need a person")
+
+
 def pytest_collection_modifyitems(config, items):
     if config.getoption("--subjective"):
         return
@@ -32,3 +40,21 @@ def pytest_collection_modifyitems(config, items):
     for item in items:
         if "subjective" in item.keywords:
             item.add_marker(skip_slow)
+
+
+def gen_sine_wave(frequency, sample_rate, length):
+    return np.sin(2 * np.pi * frequency / sample_rate * np.arange(length))
+
+
+@pytest.fixture(scope="session")
+def sine_wave():
+    sine_wave = gen_sine_wave(440, SINE_WAVE_SAMPLE_RATE, 16000)
+    sine_wave.flags.writeable = False  # shared by all the tests
+    return sine_wave
+
+
+@pytest.fixture(scope="session")
+def wav_file(sine_wave, tmp_path_factory):
+    wav_file = tmp_path_factory.mktemp("audio") / "sine_wave.wav"
+    sf.write(wav_file, sine_wave, samplerate=SINE_WAVE_SAMPLE_RATE)
+    return wav_file
@@ -21,15 +21,18 @@
 import numpy as np
 
 from lpc_vocoder.utils.pitch_estimation import pitch_estimator
+from lpc_vocoder.utils.pitch_estimation import pitch_from_autocorrelation
+from lpc_vocoder.utils.pitch_estimation import pitch_lags
+from lpc_vocoder.utils.utils import autocorrelate
 
 class TestPitchDetector:
 
     sample_rate = 8000
     signal_size = 256
+    samples = np.arange(signal_size) / sample_rate
 
     def gen_sin_wave(self, frequency):
-        samples = np.arange(self.signal_size) / self.sample_rate
-        return np.sin(2 * np.pi * frequency * samples)
+        return np.sin(2 * np.pi * frequency * self.samples)
 
     def noise(self):
         return np.random.uniform(0, 1, self.signal_size)
@@ -50,3 +53,11 @@ class TestPitchDetector:
             error_rate = abs((frequency - est_freq) / frequency)
             error_rate = float(100 * error_rate)
             assert error_rate <= 10  # check if we have less than 10% error
+
+    def test_pitch_from_autocorrelation(self):
+        signals = np.stack([self.gen_sin_wave(frequency) + self.noise() for frequency in range(50, 600, 10)])
+        autocorrelation = autocorrelate(signals, max_size=pitch_lags(self.sample_rate))
+        expected = [pitch_estimator(signal, self.sample_rate) for signal in signals]
+        for rxx, pitch in zip(autocorrelation, expected):
+            assert pitch_from_autocorrelation(rxx, self.sample_rate) == pitch
+        assert np.array_equal(pitch_from_autocorrelation(autocorrelation, self.sample_rate), expected)
@@ -18,22 +18,33 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #  SOFTWARE.
 
-import os
 import struct
 from pathlib import Path
 
+import librosa
 import numpy as np
-import soundfile as sf
+import scipy
 import pytest
 
+from lpc_vocoder.decode._arfilter import ar_filter_inplace
 from lpc_vocoder.decode.lpc_decoder import LpcDecoder
+from lpc_vocoder.encode._levinson import levinson
+from lpc_vocoder.encode._levinson import levinson_frames
 from lpc_vocoder.encode.lpc_encoder import LpcEncoder
 from lpc_vocoder.utils.dataclasses import EncodedFrame
+from lpc_vocoder.utils.utils import EMPHASIS_COEFFICIENT
+from lpc_vocoder.utils.utils import autocorrelate
+from lpc_vocoder.utils.utils import de_emphasis
+from lpc_vocoder.utils.utils import is_silence
+from lpc_vocoder.utils.utils import pre_emphasis
 
 
-def gen_sine_wave(frequency, sample_rate, length):
-    samples = np.arange(length) / sample_rate
-    return np.sin(2 * np.pi * frequency * samples)
+def assert_same_frames(frames, expected):
+    assert len(frames) == len(expected)
+    for frame, expected_frame in zip(frames, expected):
+        assert frame.gain == expected_frame.gain
+        assert frame.pitch == expected_frame.pitch
+        assert np.array_equal(frame.coefficients, expected_frame.coefficients)
 
 
 class TestEncoder:
@@ -45,15 +56,11 @@ class TestEncoder:
         return LpcEncoder()
 
     @pytest.fixture(scope="class")
-    def sine_wave(self):
-        return gen_sine_wave(440, self.sample_rate, 16000)
-
-    @pytest.fixture(scope="class")
-    def wav_file(self, sine_wave):
-        wav_file = Path("test.wav")
-        sf.write(wav_file, sine_wave, samplerate=self.sample_rate)
-        yield wav_file
-        os.remove(wav_file)
+    def encoded(self, wav_file):
+        encoder = LpcEncoder()
+        encoder.load_file(wav_file, window_size=240)
+        encoder.encode_signal()
+        return encoder
 
     def test_load_data_from_file(self, encoder, wav_file):
         encoder.load_file(wav_file)
@@ -87,10 +94,82 @@ class TestEncoder:
         encoder.encode_signal()
         assert encoder.frame_data
 
-        pitch = int(encoder.frame_data[0].pitch)
-        for frame in encoder.frame_data:
-            assert int(frame.pitch) == pitch
-        assert pitch == 444
+        frames = encoder.to_dict()["frames"]
+        pitches = frames["pitch"][frames["gain"] != 0].astype(int)  # trailing frames are silence, without pitch
+        assert pitches.size
+        assert np.all(pitches == 444)
+
+    def test_encoding_incomplete_frame(self, encoded, sine_wave):
+        hop_size = 120
+        # one frame per hop started within the signal (the blocks of librosa.stream), only the ones that have a
+        # whole window of samples are encoded, the rest are silence
+        complete_frames = len(librosa.util.frame(sine_wave, frame_length=240, hop_length=hop_size, axis=0))
+        assert len(encoded.frame_data) == int(np.ceil(len(sine_wave) / hop_size))
+        assert len(encoded.frame_data) > complete_frames
+        assert all(frame.gain for frame in encoded.frame_data[:complete_frames])
+        assert all(frame.gain == 0.0 and frame.pitch == 0.0 for frame in encoded.frame_data[complete_frames:])
+
+    def test_save_data(self, encoded, tmp_path):
+        encoded.save_data(tmp_path / "encoded")
+
+        decoder = LpcDecoder()
+        decoder.load_data_file(tmp_path / "encoded.bin")
+        assert decoder.window_size == encoded.window_size
+        assert decoder.sample_rate == encoded.sample_rate
+        assert decoder.overlap == encoded.overlap
+        assert decoder.order == encoded.order
+        assert_same_frames(decoder.frame_data, encoded.frame_data)
+
+    def test_to_dict(self, encoded):
+        data = encoded.to_dict()
+        assert data["encoder_info"] == {"order": 10, "window_size": 240, "overlap": 50,
+                                        "sample_rate": self.sample_rate}
+
+        decoder = LpcDecoder()
+        decoder.load_data(data)
+        assert_same_frames(decoder.frame_data, encoded.frame_data)
+
+        data["frames"]["gain"][:] = 0.0  # the columns are copies, the encoder keeps its frames
+        assert encoded.to_dict()["frames"]["gain"].any()
+
+    def test_levinson(self, sine_wave):
+        order = 10
+        frame = sine_wave[:256] + np.random.uniform(0, 1, 256)
+        rxx = np.correlate(frame, frame, mode='full')[len(frame) - 1:len(frame) + order]
+        coefficients = scipy.linalg.solve_toeplitz((rxx[:-1], rxx[:-1]), rxx[1:])
+        lpc_coefficients = np.empty(order + 1)
+        levinson(rxx, lpc_coefficients)
+        assert np.allclose(lpc_coefficients, np.concatenate(([1], -coefficients)))
+
+    def test_levinson_zero_frame(self, sine_wave):
+        order = 10
+        frames = np.stack([sine_wave[:256], np.zeros(256)])
+        autocorrelation = autocorrelate(frames, max_size=order + 1)
+        coefficients = np.empty((2, order + 1))
+        gains = np.empty(2)
+        levinson_frames(autocorrelation, coefficients, gains)
+        assert np.all(np.isfinite(coefficients))
+        assert gains[0] > 0
+        assert gains[1] == 0.0
+        assert np.array_equal(coefficients[1], np.concatenate(([1], np.zeros(order))))
+
+    def test_autocorrelate(self, sine_wave):
+        frames = librosa.util.frame(sine_wave, frame_length=256, hop_length=128, axis=0)
+        expected = librosa.autocorrelate(frames, max_size=11, axis=-1)
+        assert np.allclose(autocorrelate(frames, max_size=11), expected)
+
+    def test_pre_emphasis(self, sine_wave):
+        frames = librosa.util.frame(sine_wave, frame_length=256, hop_length=128, axis=0)
+        expected = scipy.signal.lfilter([1, -EMPHASIS_COEFFICIENT], [1], frames, axis=-1)
+        assert np.allclose(pre_emphasis(frames), expected)
+        assert np.allclose(de_emphasis(pre_emphasis(sine_wave)), sine_wave)
+
+    def test_silence(self, sine_wave):
+        frames = np.stack([sine_wave[:512], sine_wave[:512], np.zeros(512)])
+        frames[1, 256:] *= 1e-4  # -80 dB
+        assert list(is_silence(frames)) == [False, True, False]
+        assert not is_silence(frames[0])
+        assert is_silence(frames[1])
 
 class TestDecoder:
     sample_rate = 8000
@@ -105,8 +184,8 @@ class TestDecoder:
         return EncodedFrame(pitch=-1.0, gain=0.5, coefficients=np.array(coeffs))
 
     @pytest.fixture(scope="class")
-    def encoded_file(self, frame_data):
-        data_file = Path("test.bin")
+    def encoded_file(self, frame_data, tmp_path_factory):
+        data_file = tmp_path_factory.mktemp("encoded") / "test.bin"
         data = bytearray()
         data.extend(struct.pack('i', self.window_size))
         data.extend(struct.pack('i', self.sample_rate))
@@ -115,25 +194,28 @@ class TestDecoder:
 
         data.extend(struct.pack('d', frame_data.gain))
         data.extend(struct.pack('d', frame_data.pitch))
-        data.extend(frame_data.coefficients.tobytes())
+        data.extend(frame_data.coefficients.astype(np.float32).tobytes())
 
         with open(data_file, "wb") as f:
             f.write(data)
-        yield data_file
-        os.remove(data_file)
+        return data_file
+
+    @pytest.fixture(scope="class")
+    def encoder_info(self):
+        return {
+            "order": self.order,
+            "window_size": self.window_size,
+            "overlap": self.overlap,
+            "sample_rate": self.sample_rate,
+        }
 
     @pytest.fixture(scope="class")
     def decoder(self):
         return LpcDecoder()
 
-    def test_load_data(self, decoder, frame_data):
+    def test_load_data(self, decoder, frame_data, encoder_info):
         data = {
-            "encoder_info": {
-                "order": self.order,
-                "window_size": self.window_size,
-                "overlap": self.overlap,
-                "sample_rate": self.sample_rate,
-            },
+            "encoder_info": encoder_info,
             "frames": [frame_data.__dict__],
         }
 
@@ -143,28 +225,131 @@ class TestDecoder:
         assert decoder.sample_rate == self.sample_rate
         assert decoder.overlap == self.overlap
 
-    def test_load_data_file(self, decoder, encoded_file):
+    def test_load_columnar_data(self, frame_data, encoder_info):
+        data = {
+            "encoder_info": encoder_info,
+            "frames": {
+                "gain": [frame_data.gain] * 2,
+                "pitch": [frame_data.pitch] * 2,
+                "coefficients": np.stack([frame_data.coefficients] * 2),
+            },
+        }
+        decoder = LpcDecoder()
+        decoder.load_data(data)
+        assert_same_frames(decoder.frame_data, [frame_data] * 2)
+
+        decoder.frame_data[1].coefficients[1] = 99  # frames are copies, this doesn't change the decoder
+        assert decoder.frame_data[1].coefficients[1] == frame_data.coefficients[1]
+
+    def test_load_data_file(self, decoder, encoded_file, frame_data):
         decoder.load_data_file(encoded_file)
         assert decoder.order == self.order
         assert decoder.window_size == self.window_size
         assert decoder.sample_rate == self.sample_rate
         assert decoder.overlap == self.overlap
+        assert_same_frames(decoder.frame_data, [frame_data])
+
+    def test_load_data_file_float64(self, frame_data, tmp_path):
+        data_file = tmp_path / "test.bin"
+        data = bytearray(struct.pack('4i', self.window_size, self.sample_rate, self.overlap, self.order))
+        data.extend(struct.pack('dd', frame_data.gain, frame_data.pitch))
+        data.extend(frame_data.coefficients.astype(np.float64).tobytes())
+        data_file.write_bytes(data)
+
+        decoder = LpcDecoder()
+        with pytest.raises(ValueError, match="multiple of the frame size"):
+            decoder.load_data_file(data_file)
+        assert decoder.order == 0
 
-    def test_decoding(self, decoder, frame_data):
+        data_file.write_bytes(struct.pack('4i', self.window_size, self.sample_rate, self.overlap, 0))
+        with pytest.raises(ValueError, match="invalid LPC order 0"):
+            decoder.load_data_file(data_file)
+
+    def test_decoding(self, decoder, frame_data, encoder_info):
         data = {
-            "encoder_info": {
-                "order": self.order,
-                "window_size": self.window_size,
-                "overlap": self.overlap,
-                "sample_rate": self.sample_rate,
-            },
+            "encoder_info": encoder_info,
             "frames": [frame_data.__dict__],
         }
         decoder.load_data(data)
-        assert not decoder.signal
+        assert decoder.signal is None
         decoder.decode_signal()
         assert decoder.signal.any()
 
+    def test_decoding_silence(self, frame_data, encoder_info):
+        silence = EncodedFrame(pitch=0.0, gain=0.0, coefficients=np.ones(self.order + 1))
+        data = {
+            "encoder_info": encoder_info,
+            "frames": [silence.__dict__, frame_data.__dict__, silence.__dict__],
+        }
+        decoder = LpcDecoder()
+        decoder.load_data(data)
+        decoder.decode_signal()
+        hop_size = self.window_size // 2
+        assert len(decoder.signal) == 3 * hop_size + self.window_size
+        assert not decoder.signal[:hop_size].any()
+        assert decoder.signal[hop_size:hop_size + self.window_size].all()
+        assert not decoder.signal[hop_size + self.window_size:].any()
+
+    def test_decoding_seed(self, frame_data, encoder_info):
+        voiced = EncodedFrame(pitch=200.0, gain=0.5, coefficients=frame_data.coefficients)
+        data = {
+            "encoder_info": encoder_info,
+            "frames": [frame_data.__dict__, voiced.__dict__, frame_data.__dict__],
+        }
+        signals = []
+        for _ in range(2):
+            decoder = LpcDecoder(seed=1234)
+            decoder.load_data(data)
+            decoder.decode_signal()
+            signals.append(decoder.signal)
+        assert np.array_equal(signals[0], signals[1])
+
+    def test_decoding_frame_data(self, frame_data):
+        decoder = LpcDecoder()
+        decoder.order = self.order
+        decoder.window_size = self.window_size
+        decoder.overlap = self.overlap
+        decoder.sample_rate = self.sample_rate
+        decoder.frame_data = [frame_data, frame_data]
+        decoder.decode_signal()
+        assert decoder.signal.any()
+
+        decoder.order = self.order + 2
+        with pytest.raises(ValueError, match="coefficients"):
+            decoder.decode_signal()
+
+        decoder.order = 0
+        with pytest.raises(ValueError, match="order"):
+            decoder.decode_signal()
+
+    def test_ar_filter(self):
+        coefficients = np.array([1., -0.9, 0.4, -0.1])
+        zi = np.zeros(len(coefficients) - 1)
+        expected_zi = np.zeros(len(coefficients) - 1)
+        out = np.empty(self.window_size)
+        for _ in range(2):  # check that the filter state is carried between frames
+            excitation = np.random.uniform(0, 1, self.window_size)
+            expected, expected_zi = scipy.signal.lfilter([1.], coefficients, 0.5 * excitation, zi=expected_zi)
+            ar_filter_inplace(coefficients, 0.5, excitation, zi, out)
+            assert np.allclose(out, expected)
+            assert np.allclose(zi, expected_zi)
+
+    def test_ar_filter_de_emphasis(self):
+        coefficients = np.array([1., -0.9, 0.4, -0.1])
+        zi = np.zeros(len(coefficients) - 1)
+        excitation = np.random.uniform(0, 1, self.window_size)
+        out = np.empty(self.window_size)
+        expected, _ = scipy.signal.lfilter([1.], coefficients, 0.5 * excitation, zi=np.zeros(len(coefficients) - 1))
+        ar_filter_inplace(coefficients, 0.5, excitation, zi, out, EMPHASIS_COEFFICIENT)
+        assert np.allclose(out, de_emphasis(expected))
+
+    def test_ar_filter_no_order(self):
+        excitation = np.random.uniform(0, 1, self.window_size)
+        out = np.empty(self.window_size)
+        expected, _ = scipy.signal.lfilter([1.], [1.], 0.5 * excitation, zi=np.zeros(0))
+        ar_filter_inplace(np.ones(1), 0.5, excitation, np.zeros(0), out)
+        assert np.allclose(out, expected)
+
 
 class TestVocoder:
     sample_rate = 8000
@@ -183,7 +368,7 @@ class TestVocoder:
         plt.plot(decoder.signal)
         plt.show()
 
-    def test_process_audio(self):
+    def test_process_audio(self, tmp_path):
         """
         This test is just an end-to-end test, the fact that we don't raise
         anything is enough for me to know that everything is working
@@ -191,30 +376,19 @@ class TestVocoder:
         encoder = LpcEncoder(order=40)
         encoder.load_file(self.audio_path / "once_there_was.flac", 480)
         encoder.encode_signal()
-        encoder.save_data(Path("audio.bin"))
+        encoder.save_data(tmp_path / "audio.bin")
 
         decoder = LpcDecoder()
-        decoder.load_data_file(Path("audio.bin"))
+        decoder.load_data_file(tmp_path / "audio.bin")
         decoder.decode_signal()
 
-        os.remove("audio.bin")
-
-    @pytest.mark.subjective
-    def test_vocoder_1(self):
-        self._process_audio(self.audio_path / "once_there_was.flac", 480)
-
-    @pytest.mark.subjective
-    def test_vocoder_2(self):
-        self._process_audio(self.audio_path / "the_boys.flac", 512)
-
-    @pytest.mark.subjective
-    def test_vocoder_3(self):
-        self._process_audio(self.audio_path / "what_do_you_mea_sir.flac", 512)
-
-    @pytest.mark.subjective
-    def test_vocoder_4(self):
-        self._process_audio(self.audio_path / "then_darkness.flac", 512)
-
     @pytest.mark.subjective
-    def test_vocoder_5(self):
-        self._process_audio(self.audio_path / "sine_240hz.wav", 512)
+    @pytest.mark.parametrize("file, frame_size", [
+        ("once_there_was.flac", 480),
+        ("the_boys.flac", 512),
+        ("what_do_you_mea_sir.flac", 512),
+        ("then_darkness.flac", 512),
+        ("sine_240hz.wav", 512),
+    ])
+    def test_vocoder(self, file, frame_size):
+        self._process_audio(self.audio_path / file, frame_size)